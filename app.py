@@ -1,121 +1,545 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import errors as pg_errors
+from psycopg2.extensions import connection as PGConnection
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta
+from jinja2 import FileSystemBytecodeCache
+from flask_caching import Cache
+from flask_session import Session
+import redis
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date, timedelta
+import click
+import csv
+import hashlib
+import logging
+import multiprocessing
 import os
+import re
+import secrets
+import stat
+import threading
+import time
+
+# Per-request chatter is logged at DEBUG; production runs at WARNING unless LOG_LEVEL says otherwise
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING'))
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
+# A stable key keeps sessions valid across restarts, so redeploys don't log everyone out
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    raise RuntimeError('SECRET_KEY environment variable is not set')
 app.permanent_session_lifetime = timedelta(days=7)
+# Caps every request body (forms, /add_bulk JSON); larger ones get a 413
+app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
+
+# Templates are never re-stat'ed once loaded, and their compiled bytecode is shared
+# on disk so each worker process skips re-parsing them
+def jinja_bytecode_cache():
+    """Bytecode cache in a directory only this user can write: the cached code is
+    loaded with marshal, so a writable shared directory would let others inject code"""
+    cache_dir = os.environ.get('JINJA_CACHE_DIR')
+    if not cache_dir:
+        # Jinja's default is a per-uid 0700 directory under the temp dir, owner-checked
+        return FileSystemBytecodeCache()
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    st = os.lstat(cache_dir)
+    if (not stat.S_ISDIR(st.st_mode) or st.st_mode & 0o077
+            or (hasattr(os, 'getuid') and st.st_uid != os.getuid())):
+        raise RuntimeError(f'JINJA_CACHE_DIR {cache_dir} must be a 0700 directory owned by this user')
+    return FileSystemBytecodeCache(cache_dir)
+
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+app.jinja_env.bytecode_cache = jinja_bytecode_cache()
+
+# With SESSION_REDIS_URL set, session data lives in Redis and the cookie only carries its id
+if os.environ.get('SESSION_REDIS_URL'):
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis.from_url(os.environ['SESSION_REDIS_URL'])
+    Session(app)
+
+# Rendered dashboard fragments, per user. Off (NullCache) unless CACHE_TYPE names a
+# shared backend (e.g. RedisCache with CACHE_REDIS_URL): invalidation only reaches the
+# process that handled the write, so a per-process cache would show other workers'
+# users stale dashboards after their own changes
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'NullCache')
+if CACHE_TYPE == 'SimpleCache' and int(os.environ.get('WEB_CONCURRENCY', 1)) > 1:
+    raise RuntimeError('CACHE_TYPE=SimpleCache is per-process; use a shared cache with WEB_CONCURRENCY > 1')
+cache = Cache(app, config={
+    'CACHE_TYPE': CACHE_TYPE,
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL'),
+    'CACHE_DEFAULT_TIMEOUT': 60,
+})
+
+# Read once at import; fix postgres:// to postgresql:// (required for psycopg2)
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
+    DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+
+# Process-wide connection pool, opened once on first use (at import, via init_db)
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+# psycopg2 keeps at most minconn idle connections and closes any other returned one,
+# so keep one per gunicorn thread or overlapping requests reconnect (and re-PREPARE)
+DB_POOL_MIN = min(
+    int(os.environ.get('DB_POOL_MIN', os.environ.get('GUNICORN_THREADS', 8))),
+    DB_POOL_MAX
+)
+POOL = None
+_pool_lock = threading.Lock()
+
+class PreparedConnection(PGConnection):
+    """Connection that remembers which statements it has already PREPAREd"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+def create_pool():
+    """Open the connection pool so requests reuse connections instead of reconnecting"""
+    # Try DATABASE_URL first (for deployment platforms like Vercel, Heroku)
+    if DATABASE_URL:
+        logger.debug("Using DATABASE_URL")
+        logger.debug("Connecting to database...")
+        pool = ThreadedConnectionPool(
+            DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL, sslmode='require',
+            connection_factory=PreparedConnection
+        )
+        logger.info("Database pool opened via DATABASE_URL")
+        return pool
+    else:
+        # Fallback to individual parameters (for local development)
+        logger.debug("Using individual DB parameters")
+        pool = ThreadedConnectionPool(
+            DB_POOL_MIN, DB_POOL_MAX,
+            connection_factory=PreparedConnection,
+            dbname=os.environ.get('DB_NAME', 'todo_db'),
+            user=os.environ.get('DB_USER', 'todo_user'),
+            password=os.environ.get('DB_PASSWORD', 'thinkpad'),
+            host=os.environ.get('DB_HOST', 'localhost'),
+            port=os.environ.get('DB_PORT', '5432')
+        )
+        logger.info("Database pool opened via parameters")
+        return pool
 
 def get_db_connection():
-    """Establish database connection with comprehensive error handling"""
+    """Borrow a pooled database connection with comprehensive error handling"""
+    global POOL
     try:
-        # Try DATABASE_URL first (for deployment platforms like Vercel, Heroku)
-        db_url = os.environ.get('DATABASE_URL')
-        
-        if db_url:
-            print(f"🔵 Using DATABASE_URL")
-            # Fix postgres:// to postgresql:// (required for psycopg2)
-            if db_url.startswith('postgres://'):
-                db_url = db_url.replace('postgres://', 'postgresql://', 1)
-            
-            print(f"🔵 Connecting to database...")
-            conn = psycopg2.connect(db_url, sslmode='require')
-            print("✅ Database connected successfully via DATABASE_URL")
-            return conn
-        else:
-            # Fallback to individual parameters (for local development)
-            print("🔵 Using individual DB parameters")
-            conn = psycopg2.connect(
-                dbname=os.environ.get('DB_NAME', 'todo_db'),
-                user=os.environ.get('DB_USER', 'todo_user'),
-                password=os.environ.get('DB_PASSWORD', 'thinkpad'),
-                host=os.environ.get('DB_HOST', 'localhost'),
-                port=os.environ.get('DB_PORT', '5432')
-            )
-            print("✅ Database connected successfully via parameters")
-            return conn
+        if POOL is None:
+            with _pool_lock:
+                if POOL is None:
+                    POOL = create_pool()
+        return POOL.getconn()
             
     except Exception as e:
-        print(f"❌ Database connection error: {e}")
-        print(f"❌ Error type: {type(e).__name__}")
+        logger.error("Database connection error (%s): %s", type(e).__name__, e)
         return None
 
-def init_db():
-    """Initialize database tables if they don't exist"""
-    conn = get_db_connection()
-    if not conn:
-        print("❌ Cannot initialize database - no connection")
+# Werkzeug hashes with hashlib.pbkdf2_hmac (OpenSSL); pin the work factor instead of
+# inheriting the library default, which keeps growing between releases
+PBKDF2_ITERS = int(os.environ.get('PBKDF2_ITERS', '260000'))
+PASSWORD_METHOD = f'pbkdf2:sha256:{PBKDF2_ITERS}'
+
+# Checked against when a username doesn't exist, so unknown users cost the same PBKDF2
+# work as real ones and response times don't reveal which usernames are registered.
+# Older hashes (Werkzeug's default cost) are rehashed at PASSWORD_METHOD on login.
+_DUMMY_HASH = generate_password_hash(secrets.token_hex(16), method=PASSWORD_METHOD, salt_length=16)
+USERNAME_MAX_LENGTH = 50
+
+# PBKDF2 runs in worker processes so concurrent logins hash in parallel, off the GIL
+HASH_POOL = None
+_hash_pool_lock = threading.Lock()
+
+def get_hash_pool():
+    """Return the shared hash process pool, or None where multiprocessing is unavailable"""
+    global HASH_POOL
+    if HASH_POOL is None:
+        with _hash_pool_lock:
+            if HASH_POOL is None:
+                try:
+                    # gthread workers are multi-threaded, and forking a threaded process can
+                    # copy a lock some other thread holds; forkserver children start clean
+                    HASH_POOL = ProcessPoolExecutor(
+                        max_workers=os.cpu_count(),
+                        mp_context=multiprocessing.get_context('forkserver')
+                    )
+                except (OSError, NotImplementedError, ValueError) as e:
+                    # ValueError: no forkserver on this platform (Windows)
+                    # Some serverless runtimes lack the semaphores multiprocessing needs
+                    logger.warning("Hash pool unavailable, hashing inline: %s", e)
+    return HASH_POOL
+
+def run_hash(fn, *args):
+    """Run a password hashing function on the process pool, inline if unavailable"""
+    global HASH_POOL
+    pool = get_hash_pool()
+    if pool is None:
+        return fn(*args)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool as e:
+        # A worker died; reap the broken pool and start a fresh one on the next call
+        logger.warning("Hash pool broken, hashing inline: %s", e)
+        with _hash_pool_lock:
+            if HASH_POOL is pool:
+                HASH_POOL = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return fn(*args)
+
+# Recently verified (user_id, sha256(stored hash + password)) pairs, so repeat logins
+# skip PBKDF2; mixing in the stored hash drops entries if the password ever changes
+PASSWORD_CACHE_TTL = 300
+_password_cache = {}
+_password_cache_lock = threading.Lock()
+
+def verify_password(user_id, password_hash, password):
+    """Check a password, reusing a recent successful PBKDF2 verification"""
+    key = (user_id, hashlib.sha256(password_hash.encode() + b'\0' + password.encode()).digest())
+    now = time.monotonic()
+    with _password_cache_lock:
+        verified_at = _password_cache.get(key)
+    if verified_at is not None and now - verified_at < PASSWORD_CACHE_TTL:
+        return True
+    
+    if not run_hash(check_password_hash, password_hash, password):
         return False
     
+    with _password_cache_lock:
+        # Drop expired entries so the cache stays bounded by recent logins
+        for stale in [k for k, t in _password_cache.items() if now - t >= PASSWORD_CACHE_TTL]:
+            del _password_cache[stale]
+        _password_cache[key] = now
+    return True
+
+def upgrade_password_hash(user_id, password_hash, password):
+    """Rehash a verified password made with another method (e.g. Werkzeug's 1M-iteration
+    default) at PASSWORD_METHOD, so every account converges on the cost _DUMMY_HASH mimics"""
+    if password_hash.startswith(PASSWORD_METHOD + '$'):
+        return
+    new_hash = run_hash(generate_password_hash, password, PASSWORD_METHOD, 16)
+    with db_conn() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                # Only replace the hash that was verified, never a concurrent password change
+                cur.execute(
+                    'UPDATE todo_users SET password = %s WHERE id = %s AND password = %s',
+                    (new_hash, user_id, password_hash)
+                )
+            conn.commit()
+        except Exception as e:
+            logger.warning("Password rehash failed for user %s: %s", user_id, e)
+            conn.rollback()
+
+@contextmanager
+def db_conn():
+    """Borrow a pooled connection for a with-block and always hand it back"""
+    conn = get_db_connection()
     try:
-        cur = conn.cursor()
-        
-        print("🔵 Creating tables if not exist...")
-        
-        # Users table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todo_users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Categories table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todo_categories (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES todo_users(id) ON DELETE CASCADE,
-                name VARCHAR(100) NOT NULL,
-                color VARCHAR(7) DEFAULT '#667eea',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, name)
-            )
-        ''')
-        
-        # Todos table
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todo_items (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES todo_users(id) ON DELETE CASCADE,
-                category_id INTEGER REFERENCES todo_categories(id) ON DELETE SET NULL,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                priority VARCHAR(10) DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
-                status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'in_progress', 'completed')),
-                due_date DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create indexes
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_user_id ON todo_items(user_id)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_status ON todo_items(status)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_categories_user_id ON todo_categories(user_id)')
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        print("✅ Database tables initialized successfully")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Database initialization error: {e}")
+        yield conn
+    finally:
         if conn:
+            POOL.putconn(conn)
+
+# Arbitrary advisory lock key reserved for init_db
+INIT_DB_LOCK_KEY = 7_220_431
+
+def init_db():
+    """Initialize database tables if they don't exist"""
+    with db_conn() as conn:
+        if not conn:
+            logger.error("Cannot initialize database - no connection")
+            return False
+        
+        try:
+            with conn.cursor() as cur:
+                # Workers booting together would otherwise race on the DDL below
+                # (CREATE OR REPLACE FUNCTION fails with "tuple concurrently updated");
+                # the lock serialises them and is released at commit or rollback
+                cur.execute('SELECT pg_advisory_xact_lock(%s)', (INIT_DB_LOCK_KEY,))
+                
+                logger.debug("Creating tables if not exist...")
+                
+                # Users table
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS todo_users (
+                        id SERIAL PRIMARY KEY,
+                        username VARCHAR(50) UNIQUE NOT NULL,
+                        password VARCHAR(255) NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Categories table
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS todo_categories (
+                        id SERIAL PRIMARY KEY,
+                        user_id INTEGER REFERENCES todo_users(id) ON DELETE CASCADE,
+                        name VARCHAR(100) NOT NULL,
+                        color VARCHAR(7) DEFAULT '#667eea',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE(user_id, name)
+                    )
+                ''')
+                
+                # Todos table
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS todo_items (
+                        id SERIAL PRIMARY KEY,
+                        user_id INTEGER REFERENCES todo_users(id) ON DELETE CASCADE,
+                        category_id INTEGER REFERENCES todo_categories(id) ON DELETE SET NULL,
+                        title VARCHAR(255) NOT NULL,
+                        description TEXT,
+                        priority VARCHAR(10) DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
+                        status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'in_progress', 'completed')),
+                        due_date DATE,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Sort keys for the dashboard ordering, kept in sync by Postgres.
+                # ALTER TABLE takes an ACCESS EXCLUSIVE lock even when the columns
+                # exist, so only run it when they don't
+                cur.execute('''
+                    SELECT count(*) FROM pg_attribute
+                    WHERE attrelid = 'todo_items'::regclass
+                      AND attname IN ('status_ord', 'priority_ord') AND NOT attisdropped
+                ''')
+                if cur.fetchone()[0] < 2:
+                    cur.execute('''
+                        ALTER TABLE todo_items
+                        ADD COLUMN IF NOT EXISTS status_ord SMALLINT GENERATED ALWAYS AS (
+                            CASE status WHEN 'in_progress' THEN 1 WHEN 'pending' THEN 2 WHEN 'completed' THEN 3 END
+                        ) STORED,
+                        ADD COLUMN IF NOT EXISTS priority_ord SMALLINT GENERATED ALWAYS AS (
+                            CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END
+                        ) STORED
+                    ''')
+                
+                # Create indexes
+                # idx_todos_user_ordered matches the dashboard ORDER BY and also serves
+                # plain user_id lookups, so the old single-column index is dropped
+                cur.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_todos_user_ordered
+                    ON todo_items(user_id, status_ord, priority_ord, created_at DESC)
+                ''')
+                cur.execute('DROP INDEX IF EXISTS idx_todos_user_id')
+                cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_status ON todo_items(status)')
+                cur.execute('CREATE INDEX IF NOT EXISTS idx_categories_user_id ON todo_categories(user_id)')
+                
+                # Per-user status counts kept current by a trigger on todo_items,
+                # so the dashboard reads one row instead of aggregating every todo
+                cur.execute('''
+                    CREATE TABLE IF NOT EXISTS todo_stats (
+                        user_id INTEGER PRIMARY KEY,
+                        total INTEGER NOT NULL DEFAULT 0,
+                        pending INTEGER NOT NULL DEFAULT 0,
+                        in_progress INTEGER NOT NULL DEFAULT 0,
+                        completed INTEGER NOT NULL DEFAULT 0
+                    )
+                ''')
+                cur.execute('''
+                    CREATE OR REPLACE FUNCTION todo_stats_apply(uid INTEGER, st VARCHAR, delta INTEGER)
+                    RETURNS void AS $$
+                        INSERT INTO todo_stats (user_id, total, pending, in_progress, completed)
+                        VALUES (
+                            uid, delta,
+                            CASE WHEN st = 'pending' THEN delta ELSE 0 END,
+                            CASE WHEN st = 'in_progress' THEN delta ELSE 0 END,
+                            CASE WHEN st = 'completed' THEN delta ELSE 0 END
+                        )
+                        ON CONFLICT (user_id) DO UPDATE SET
+                            total = todo_stats.total + EXCLUDED.total,
+                            pending = todo_stats.pending + EXCLUDED.pending,
+                            in_progress = todo_stats.in_progress + EXCLUDED.in_progress,
+                            completed = todo_stats.completed + EXCLUDED.completed
+                    $$ LANGUAGE sql
+                ''')
+                cur.execute('''
+                    CREATE OR REPLACE FUNCTION todo_stats_sync() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+                            PERFORM todo_stats_apply(OLD.user_id, OLD.status, -1);
+                        END IF;
+                        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+                            PERFORM todo_stats_apply(NEW.user_id, NEW.status, 1);
+                        END IF;
+                        RETURN NULL;
+                    END
+                    $$ LANGUAGE plpgsql
+                ''')
+                
+                # Install the trigger and backfill counts once; the lock keeps writers
+                # out until both are committed
+                cur.execute('LOCK TABLE todo_items IN SHARE ROW EXCLUSIVE MODE')
+                cur.execute(
+                    "SELECT 1 FROM pg_trigger WHERE tgname = 'todo_stats_sync' AND tgrelid = 'todo_items'::regclass"
+                )
+                if not cur.fetchone():
+                    logger.info("Installing todo_stats trigger and backfilling counts...")
+                    cur.execute('''
+                        CREATE TRIGGER todo_stats_sync
+                        AFTER INSERT OR UPDATE OF status, user_id OR DELETE ON todo_items
+                        FOR EACH ROW EXECUTE FUNCTION todo_stats_sync()
+                    ''')
+                    cur.execute('DELETE FROM todo_stats')
+                    cur.execute('''
+                        INSERT INTO todo_stats (user_id, total, pending, in_progress, completed)
+                        SELECT user_id,
+                               COUNT(*),
+                               COUNT(*) FILTER (WHERE status = 'pending'),
+                               COUNT(*) FILTER (WHERE status = 'in_progress'),
+                               COUNT(*) FILTER (WHERE status = 'completed')
+                        FROM todo_items
+                        WHERE user_id IS NOT NULL
+                        GROUP BY user_id
+                    ''')
+            
+            conn.commit()
+            
+            logger.info("Database tables initialized successfully")
+            return True
+            
+        except Exception as e:
+            logger.error("Database initialization error: %s", e)
             conn.rollback()
-            conn.close()
-        return False
+            return False
 
 # Initialize database on startup
 with app.app_context():
     init_db()
 
+# Hot statements are PREPAREd once per pooled connection (see execute_prepared),
+# so Postgres skips parsing and planning them on every request
+
+# Ordered todo list as a JSON array of objects
+TODOS_SQL = '''
+    SELECT json_agg(row_to_json(t_ordered)) AS data
+    FROM (
+        SELECT t.id, t.title, t.description, t.priority, t.status,
+               c.name AS category_name, c.color AS category_color,
+               to_char(t.due_date, 'YYYY-MM-DD') AS due_date,
+               to_char(t.created_at, 'YYYY-MM-DD HH24:MI') AS created_at
+        FROM todo_items t
+        LEFT JOIN todo_categories c ON t.category_id = c.id
+        WHERE t.user_id = $1
+        ORDER BY t.status_ord, t.priority_ord, t.created_at DESC
+    ) t_ordered
+'''
+
+# Dashboard data in one round-trip: categories, ordered todos and stats as JSON columns
+DASHBOARD_SQL = f'''
+    WITH cats AS (
+        SELECT json_agg(json_build_object('id', id, 'name', name, 'color', color) ORDER BY name) AS data
+        FROM todo_categories
+        WHERE user_id = $1
+    ), items AS ({TODOS_SQL}), st AS (
+        SELECT json_build_object(
+                   'total', total,
+                   'completed', completed,
+                   'pending', pending,
+                   'in_progress', in_progress
+               ) AS data
+        FROM todo_stats
+        WHERE user_id = $1
+    )
+    SELECT (SELECT data FROM cats), (SELECT data FROM items), (SELECT data FROM st)
+'''
+
+INSERT_TODO_SQL = '''
+    INSERT INTO todo_items (user_id, title, description, priority, category_id, due_date, status)
+    VALUES ($1, $2, $3, $4, $5, $6, 'pending')
+'''
+
+PREPARED_STATEMENTS = {
+    'dashboard': DASHBOARD_SQL,
+    'ins_todo': INSERT_TODO_SQL,
+}
+
+# The same statements with psycopg2 placeholders ($1 -> %(p1)s), run when preparing is off
+PLAIN_STATEMENTS = {
+    name: re.sub(r'\$(\d+)', r'%(p\1)s', sql) for name, sql in PREPARED_STATEMENTS.items()
+}
+
+# PREPARE lives in the server session, so it breaks behind transaction-mode poolers
+# (PgBouncer on Neon/Supabase pooled endpoints); set DB_PREPARE=0 there. It is also
+# switched off for this process the first time a prepared statement goes missing.
+DB_PREPARE = os.environ.get('DB_PREPARE', '1') != '0'
+
+def execute_prepared(cur, name, params):
+    """Run a named prepared statement, preparing it on first use on this connection.
+    Errors roll the connection back, so call this first in its transaction"""
+    global DB_PREPARE
+    conn = cur.connection
+    if DB_PREPARE:
+        try:
+            if name not in conn.prepared:
+                cur.execute(f'PREPARE {name} AS {PREPARED_STATEMENTS[name]}')
+                conn.prepared.add(name)
+            placeholders = ', '.join(['%s'] * len(params))
+            cur.execute(f'EXECUTE {name} ({placeholders})', params)
+            return
+        except (pg_errors.InvalidSqlStatementName, pg_errors.DuplicatePreparedStatement) as e:
+            # Statements aren't following the connection to its backend; stop preparing
+            logger.warning("Prepared statements unavailable, running unprepared: %s", e)
+            conn.rollback()
+            conn.prepared.clear()
+            DB_PREPARE = False
+    cur.execute(PLAIN_STATEMENTS[name], {f'p{i}': value for i, value in enumerate(params, 1)})
+
+EMPTY_STATS = {'total': 0, 'completed': 0, 'pending': 0, 'in_progress': 0}
+
+# Categories every new account starts with
+DEFAULT_CATEGORIES = [
+    ('Work', '#667eea'),
+    ('Personal', '#48bb78'),
+    ('Shopping', '#f59e0b'),
+    ('Health', '#ef4444')
+]
+
+# Allowed values, mirroring the CHECK constraints on todo_items; bad input is
+# rejected before it costs a database round-trip
+PRIORITIES = frozenset({'low', 'medium', 'high'})
+STATUSES = frozenset({'pending', 'in_progress', 'completed'})
+TITLE_MAX_LENGTH = 255
+# One /add_bulk request is one INSERT page; bigger batches would hold a pooled
+# connection (and fire the todo_stats trigger per row) for as long as they like
+BULK_MAX_ITEMS = 500
+
+@cache.memoize()
+def render_dashboard_content(user_id):
+    """Render the per-user part of the dashboard, or None if it could not be loaded"""
+    with db_conn() as conn:
+        if not conn:
+            flash('Database connection error', 'error')
+            return None
+        
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(cur, 'dashboard', (user_id,))
+                categories, todos, stats = cur.fetchone()
+            
+        except Exception as e:
+            logger.error("Dashboard error: %s", e)
+            flash('Error loading dashboard', 'error')
+            return None
+    
+    return render_template(
+        'dashboard_content.html',
+        todos=todos or [], categories=categories or [], stats=stats or EMPTY_STATS
+    )
+
+def invalidate_dashboard(user_id):
+    """Drop a user's cached dashboard after their todos or categories change"""
+    cache.delete_memoized(render_dashboard_content, user_id)
+
 # Routes
 @app.route('/')
 def landing():
@@ -131,7 +555,7 @@ def register():
         return redirect(url_for('dashboard'))
     
     if request.method == 'POST':
-        print("🔵 Registration attempt started")
+        logger.debug("Registration attempt started")
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
         
@@ -147,62 +571,53 @@ def register():
             flash('Password must be at least 6 characters long', 'error')
             return render_template('register.html')
         
-        conn = get_db_connection()
-        if not conn:
-            print("❌ Database connection failed in register")
-            flash('Database connection error. Please try again later.', 'error')
+        if len(username) > USERNAME_MAX_LENGTH:
+            flash(f'Username must be at most {USERNAME_MAX_LENGTH} characters long', 'error')
             return render_template('register.html')
         
-        try:
-            print(f"🔵 Checking if username exists: {username}")
-            cur = conn.cursor()
-            cur.execute('SELECT id FROM todo_users WHERE username = %s', (username,))
-            if cur.fetchone():
-                print(f"❌ Username already exists: {username}")
-                flash('Username already exists. Please choose another.', 'error')
-                cur.close()
-                conn.close()
+        with db_conn() as conn:
+            if not conn:
+                logger.error("Database connection failed in register")
+                flash('Database connection error. Please try again later.', 'error')
                 return render_template('register.html')
             
-            print(f"🔵 Creating new user: {username}")
-            hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
-            cur.execute(
-                'INSERT INTO todo_users (username, password) VALUES (%s, %s) RETURNING id',
-                (username, hashed_password)
-            )
-            user_id = cur.fetchone()[0]
-            conn.commit()
-            
-            print(f"✅ User created with ID: {user_id}")
-            
-            # Create default categories for new user
-            default_categories = [
-                ('Work', '#667eea'),
-                ('Personal', '#48bb78'),
-                ('Shopping', '#f59e0b'),
-                ('Health', '#ef4444')
-            ]
-            
-            for cat_name, cat_color in default_categories:
-                cur.execute(
-                    'INSERT INTO todo_categories (user_id, name, color) VALUES (%s, %s, %s)',
-                    (user_id, cat_name, cat_color)
-                )
-            
-            conn.commit()
-            cur.close()
-            conn.close()
-            
-            print(f"✅ Registration successful for {username}")
-            flash('Registration successful! Please log in.', 'success')
-            return redirect(url_for('login'))
-            
-        except Exception as e:
-            print(f"❌ Registration error: {e}")
-            if conn:
+            try:
+                with conn.cursor() as cur:
+                    logger.debug("Checking if username exists: %s", username)
+                    cur.execute('SELECT id FROM todo_users WHERE username = %s', (username,))
+                    if cur.fetchone():
+                        logger.debug("Username already exists: %s", username)
+                        flash('Username already exists. Please choose another.', 'error')
+                        return render_template('register.html')
+                    
+                    logger.debug("Creating new user: %s", username)
+                    hashed_password = run_hash(generate_password_hash, password, PASSWORD_METHOD, 16)
+                    cur.execute(
+                        'INSERT INTO todo_users (username, password) VALUES (%s, %s) RETURNING id',
+                        (username, hashed_password)
+                    )
+                    user_id = cur.fetchone()[0]
+                    conn.commit()
+                    
+                    logger.debug("User created with ID: %s", user_id)
+                    
+                    # Create default categories for new user
+                    for cat_name, cat_color in DEFAULT_CATEGORIES:
+                        cur.execute(
+                            'INSERT INTO todo_categories (user_id, name, color) VALUES (%s, %s, %s)',
+                            (user_id, cat_name, cat_color)
+                        )
+                
+                conn.commit()
+                
+                logger.info("Registration successful for %s", username)
+                flash('Registration successful! Please log in.', 'success')
+                return redirect(url_for('login'))
+                
+            except Exception as e:
+                logger.error("Registration error: %s", e)
                 conn.rollback()
-                conn.close()
-            flash('Registration failed. Please try again.', 'error')
+                flash('Registration failed. Please try again.', 'error')
     
     return render_template('register.html')
 
@@ -213,7 +628,7 @@ def login():
         return redirect(url_for('dashboard'))
     
     if request.method == 'POST':
-        print("🔵 Login attempt started")
+        logger.debug("Login attempt started")
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
         
@@ -221,41 +636,45 @@ def login():
             flash('Please enter both username and password', 'error')
             return render_template('login.html')
         
-        print(f"🔵 Attempting login for user: {username}")
-        
-        conn = get_db_connection()
-        if not conn:
-            print("❌ Database connection failed in login")
-            flash('Database connection error. Please try again later.', 'error')
+        # Longer names can't exist (VARCHAR(50)), so reject them before any DB or hash work
+        if len(username) > USERNAME_MAX_LENGTH:
+            flash('Invalid username or password', 'error')
             return render_template('login.html')
         
-        try:
-            cur = conn.cursor()
-            print("🔵 Executing database query")
-            cur.execute(
-                'SELECT id, username, password FROM todo_users WHERE username = %s',
-                (username,)
-            )
-            user = cur.fetchone()
-            cur.close()
-            conn.close()
+        logger.debug("Attempting login for user: %s", username)
+        
+        with db_conn() as conn:
+            if not conn:
+                logger.error("Database connection failed in login")
+                flash('Database connection error. Please try again later.', 'error')
+                return render_template('login.html')
             
-            if user and check_password_hash(user[2], password):
-                print(f"✅ Login successful for {username}")
-                session.permanent = True
-                session['user_id'] = user[0]
-                session['username'] = user[1]
-                flash(f'Welcome back, {user[1]}!', 'success')
-                return redirect(url_for('dashboard'))
-            else:
-                print(f"❌ Invalid credentials for {username}")
-                flash('Invalid username or password', 'error')
-                
-        except Exception as e:
-            print(f"❌ Error during login: {e}")
-            if conn:
-                conn.close()
-            flash('An error occurred. Please try again.', 'error')
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    logger.debug("Executing database query")
+                    cur.execute(
+                        'SELECT id, username, password FROM todo_users WHERE username = %s',
+                        (username,)
+                    )
+                    user = cur.fetchone()
+            except Exception as e:
+                logger.error("Error during login: %s", e)
+                flash('An error occurred. Please try again.', 'error')
+                return render_template('login.html')
+        
+        if user and verify_password(user['id'], user['password'], password):
+            logger.debug("Login successful for %s", username)
+            upgrade_password_hash(user['id'], user['password'], password)
+            session.permanent = True
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            flash(f"Welcome back, {user['username']}!", 'success')
+            return redirect(url_for('dashboard'))
+        else:
+            if not user:
+                run_hash(check_password_hash, _DUMMY_HASH, password)
+            logger.debug("Invalid credentials for %s", username)
+            flash('Invalid username or password', 'error')
     
     return render_template('login.html')
 
@@ -266,79 +685,12 @@ def dashboard():
         flash('Please log in to access the dashboard', 'error')
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
-        return render_template('dashboard.html', todos=[], categories=[], stats={
-            'total': 0, 'completed': 0, 'pending': 0, 'in_progress': 0
-        })
+    content = render_dashboard_content(session['user_id'])
+    if content is None:
+        content = render_template('dashboard_content.html', todos=[], categories=[], stats=EMPTY_STATS)
     
-    try:
-        cur = conn.cursor()
-        
-        # Get categories
-        cur.execute(
-            'SELECT id, name, color FROM todo_categories WHERE user_id = %s ORDER BY name',
-            (session['user_id'],)
-        )
-        categories = cur.fetchall()
-        
-        # Get todos
-        cur.execute(
-            '''SELECT t.id, t.title, t.description, t.priority, t.status, 
-                      c.name, c.color, t.due_date, t.created_at
-               FROM todo_items t
-               LEFT JOIN todo_categories c ON t.category_id = c.id
-               WHERE t.user_id = %s 
-               ORDER BY 
-                   CASE t.status 
-                       WHEN 'in_progress' THEN 1
-                       WHEN 'pending' THEN 2
-                       WHEN 'completed' THEN 3
-                   END,
-                   CASE t.priority
-                       WHEN 'high' THEN 1
-                       WHEN 'medium' THEN 2
-                       WHEN 'low' THEN 3
-                   END,
-                   t.created_at DESC''',
-            (session['user_id'],)
-        )
-        todos = cur.fetchall()
-        
-        # Get stats
-        cur.execute(
-            '''SELECT 
-                   COUNT(*) as total,
-                   SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
-                   SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending,
-                   SUM(CASE WHEN status = 'in_progress' THEN 1 ELSE 0 END) as in_progress
-               FROM todo_items 
-               WHERE user_id = %s''',
-            (session['user_id'],)
-        )
-        stats_row = cur.fetchone()
-        stats = {
-            'total': stats_row[0] or 0,
-            'completed': stats_row[1] or 0,
-            'pending': stats_row[2] or 0,
-            'in_progress': stats_row[3] or 0
-        }
-        
-        cur.close()
-        conn.close()
-        
-        print(f"✅ Dashboard loaded for user {session['username']}")
-        return render_template('dashboard.html', todos=todos, categories=categories, stats=stats)
-        
-    except Exception as e:
-        print(f"❌ Dashboard error: {e}")
-        if conn:
-            conn.close()
-        flash('Error loading dashboard', 'error')
-        return render_template('dashboard.html', todos=[], categories=[], stats={
-            'total': 0, 'completed': 0, 'pending': 0, 'in_progress': 0
-        })
+    logger.debug("Dashboard loaded for user %s", session['username'])
+    return render_template('dashboard.html', content=content)
 
 @app.route('/add', methods=['POST'])
 def add_todo():
@@ -357,40 +709,137 @@ def add_todo():
         flash('Task title is required', 'error')
         return redirect(url_for('dashboard'))
     
+    if priority not in PRIORITIES:
+        flash('Invalid task priority', 'error')
+        return redirect(url_for('dashboard'))
+    
     if category_id == '':
         category_id = None
     
     if due_date == '':
         due_date = None
     
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
-        return redirect(url_for('dashboard'))
-    
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            '''INSERT INTO todo_items (user_id, title, description, priority, category_id, due_date, status) 
-               VALUES (%s, %s, %s, %s, %s, %s, 'pending')''',
-            (session['user_id'], title, description, priority, category_id, due_date)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        print(f"✅ Task added: {title}")
-        flash('Task added successfully!', 'success')
+    with db_conn() as conn:
+        if not conn:
+            flash('Database connection error', 'error')
+            return redirect(url_for('dashboard'))
         
-    except Exception as e:
-        print(f"❌ Add todo error: {e}")
-        if conn:
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(
+                    cur, 'ins_todo',
+                    (session['user_id'], title, description, priority, category_id, due_date)
+                )
+            conn.commit()
+            invalidate_dashboard(session['user_id'])
+            
+            logger.debug("Task added: %s", title)
+            flash('Task added successfully!', 'success')
+            
+        except Exception as e:
+            logger.error("Add todo error: %s", e)
             conn.rollback()
-            conn.close()
-        flash('Failed to add task', 'error')
+            flash('Failed to add task', 'error')
     
     return redirect(url_for('dashboard'))
 
+def parse_bulk_todo(item):
+    """Validate one /add_bulk item; returns (title, description, priority, category_id,
+    due_date) and None, or None and an error message"""
+    if not isinstance(item, dict):
+        return None, 'Every todo must be a JSON object'
+    
+    title = item.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return None, 'Every todo needs a title'
+    if len(title.strip()) > TITLE_MAX_LENGTH:
+        return None, f'Titles must be at most {TITLE_MAX_LENGTH} characters long'
+    
+    description = item.get('description') or ''
+    if not isinstance(description, str):
+        return None, 'Description must be a string'
+    
+    priority = item.get('priority') or 'medium'
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        return None, f"Priority must be one of {', '.join(sorted(PRIORITIES))}"
+    
+    category_id = item.get('category_id')
+    if category_id is not None:
+        # Integers or digit strings only (bool is an int subclass, floats would truncate)
+        if isinstance(category_id, bool) or not isinstance(category_id, (int, str)):
+            return None, 'category_id must be an integer'
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None, 'category_id must be an integer'
+    
+    due_date = item.get('due_date') or None
+    if due_date is not None:
+        try:
+            due_date = date.fromisoformat(due_date)
+        except (TypeError, ValueError):
+            return None, 'due_date must be a YYYY-MM-DD date'
+    
+    return (title.strip(), description.strip(), priority, category_id, due_date), None
+
+@app.route('/add_bulk', methods=['POST'])
+def add_todos_bulk():
+    """Add many todos from a JSON array in a single INSERT"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please log in first'}), 401
+    
+    if (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Request body too large'}), 413
+    
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty JSON array of todos'}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'error': f'At most {BULK_MAX_ITEMS} todos per request'}), 413
+    
+    rows = []
+    for item in items:
+        row, error = parse_bulk_todo(item)
+        if error:
+            return jsonify({'error': error}), 400
+        rows.append((session['user_id'],) + row)
+    category_ids = list({row[4] for row in rows if row[4] is not None})
+    
+    with db_conn() as conn:
+        if not conn:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        try:
+            with conn.cursor() as cur:
+                # Another user's category would leak its name and colour into this dashboard
+                if category_ids:
+                    cur.execute(
+                        'SELECT count(*) FROM todo_categories WHERE user_id = %s AND id = ANY(%s)',
+                        (session['user_id'], category_ids)
+                    )
+                    if cur.fetchone()[0] != len(category_ids):
+                        conn.rollback()
+                        return jsonify({'error': 'Unknown category_id'}), 400
+                inserted = execute_values(
+                    cur,
+                    '''INSERT INTO todo_items (user_id, title, description, priority, category_id, due_date, status)
+                       VALUES %s RETURNING id''',
+                    rows,
+                    template="(%s, %s, %s, %s, %s, %s, 'pending')",
+                    page_size=BULK_MAX_ITEMS,
+                    fetch=True
+                )
+            conn.commit()
+            invalidate_dashboard(session['user_id'])
+            
+        except Exception as e:
+            logger.error("Bulk add error: %s", e)
+            conn.rollback()
+            return jsonify({'error': 'Failed to add tasks'}), 500
+    
+    logger.debug("%d tasks added in bulk", len(inserted))
+    return jsonify({'ids': [row[0] for row in inserted]}), 201
+
 @app.route('/update/<int:todo_id>', methods=['POST'])
 def update_todo_status(todo_id):
     """Update todo status"""
@@ -400,36 +849,36 @@ def update_todo_status(todo_id):
     
     status = request.form.get('status', 'pending')
     
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
+    if status not in STATUSES:
+        flash('Invalid task status', 'error')
         return redirect(url_for('dashboard'))
     
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            '''UPDATE todo_items 
-               SET status = %s, updated_at = CURRENT_TIMESTAMP 
-               WHERE id = %s AND user_id = %s''',
-            (status, todo_id, session['user_id'])
-        )
-        conn.commit()
-        
-        if cur.rowcount > 0:
-            print(f"✅ Task {todo_id} status updated to {status}")
-            flash('Task status updated!', 'success')
-        else:
-            flash('Task not found', 'error')
+    with db_conn() as conn:
+        if not conn:
+            flash('Database connection error', 'error')
+            return redirect(url_for('dashboard'))
         
-        cur.close()
-        conn.close()
-            
-    except Exception as e:
-        print(f"❌ Update error: {e}")
-        if conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    '''UPDATE todo_items 
+                       SET status = %s, updated_at = CURRENT_TIMESTAMP 
+                       WHERE id = %s AND user_id = %s''',
+                    (status, todo_id, session['user_id'])
+                )
+                conn.commit()
+                
+                if cur.rowcount > 0:
+                    invalidate_dashboard(session['user_id'])
+                    logger.debug("Task %s status updated to %s", todo_id, status)
+                    flash('Task status updated!', 'success')
+                else:
+                    flash('Task not found', 'error')
+                
+        except Exception as e:
+            logger.error("Update error: %s", e)
             conn.rollback()
-            conn.close()
-        flash('Failed to update task', 'error')
+            flash('Failed to update task', 'error')
     
     return redirect(url_for('dashboard'))
 
@@ -440,34 +889,30 @@ def delete_todo(todo_id):
         flash('Please log in first', 'error')
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
-        return redirect(url_for('dashboard'))
-    
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            'DELETE FROM todo_items WHERE id = %s AND user_id = %s',
-            (todo_id, session['user_id'])
-        )
-        conn.commit()
-        
-        if cur.rowcount > 0:
-            print(f"✅ Task {todo_id} deleted")
-            flash('Task deleted successfully!', 'success')
-        else:
-            flash('Task not found', 'error')
+    with db_conn() as conn:
+        if not conn:
+            flash('Database connection error', 'error')
+            return redirect(url_for('dashboard'))
         
-        cur.close()
-        conn.close()
-            
-    except Exception as e:
-        print(f"❌ Delete error: {e}")
-        if conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'DELETE FROM todo_items WHERE id = %s AND user_id = %s',
+                    (todo_id, session['user_id'])
+                )
+                conn.commit()
+                
+                if cur.rowcount > 0:
+                    invalidate_dashboard(session['user_id'])
+                    logger.debug("Task %s deleted", todo_id)
+                    flash('Task deleted successfully!', 'success')
+                else:
+                    flash('Task not found', 'error')
+                
+        except Exception as e:
+            logger.error("Delete error: %s", e)
             conn.rollback()
-            conn.close()
-        flash('Failed to delete task', 'error')
+            flash('Failed to delete task', 'error')
     
     return redirect(url_for('dashboard'))
 
@@ -485,35 +930,30 @@ def add_category():
         flash('Category name is required', 'error')
         return redirect(url_for('dashboard'))
     
-    conn = get_db_connection()
-    if not conn:
-        flash('Database connection error', 'error')
-        return redirect(url_for('dashboard'))
-    
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            'INSERT INTO todo_categories (user_id, name, color) VALUES (%s, %s, %s)',
-            (session['user_id'], name, color)
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        print(f"✅ Category added: {name}")
-        flash('Category added successfully!', 'success')
+    with db_conn() as conn:
+        if not conn:
+            flash('Database connection error', 'error')
+            return redirect(url_for('dashboard'))
         
-    except psycopg2.IntegrityError:
-        if conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'INSERT INTO todo_categories (user_id, name, color) VALUES (%s, %s, %s)',
+                    (session['user_id'], name, color)
+                )
+            conn.commit()
+            invalidate_dashboard(session['user_id'])
+            
+            logger.debug("Category added: %s", name)
+            flash('Category added successfully!', 'success')
+            
+        except psycopg2.IntegrityError:
             conn.rollback()
-            conn.close()
-        flash('Category already exists', 'error')
-    except Exception as e:
-        print(f"❌ Add category error: {e}")
-        if conn:
+            flash('Category already exists', 'error')
+        except Exception as e:
+            logger.error("Add category error: %s", e)
             conn.rollback()
-            conn.close()
-        flash('Failed to add category', 'error')
+            flash('Failed to add category', 'error')
     
     return redirect(url_for('dashboard'))
 
@@ -525,6 +965,54 @@ def logout():
     flash(f'Goodbye {username}! You have been logged out successfully.', 'success')
     return redirect(url_for('landing'))
 
+@app.cli.command('bulk-register')
+@click.argument('users_file', type=click.File())
+def bulk_register(users_file):
+    """Register users from a CSV of username,password rows (flask --app app bulk-register FILE)"""
+    accounts = {}
+    for line_no, row in enumerate(csv.reader(users_file), 1):
+        if not row:
+            continue
+        if len(row) != 2 or not 3 <= len(row[0].strip()) <= USERNAME_MAX_LENGTH or len(row[1].strip()) < 6:
+            raise click.ClickException(f'Line {line_no}: expected username,password (3-{USERNAME_MAX_LENGTH} chars, password 6+)')
+        accounts[row[0].strip()] = row[1].strip()
+    
+    # Each PBKDF2 hash is independent, so spread them across every core
+    pool = get_hash_pool()
+    if pool is None:
+        users = [(name, generate_password_hash(pw, PASSWORD_METHOD, 16)) for name, pw in accounts.items()]
+    else:
+        futures = {pool.submit(generate_password_hash, pw, PASSWORD_METHOD, 16): name for name, pw in accounts.items()}
+        users = [(futures[future], future.result()) for future in as_completed(futures)]
+    
+    with db_conn() as conn:
+        if not conn:
+            raise click.ClickException('Database connection error')
+        
+        try:
+            with conn.cursor() as cur:
+                created = execute_values(
+                    cur,
+                    '''INSERT INTO todo_users (username, password) VALUES %s
+                       ON CONFLICT (username) DO NOTHING RETURNING id''',
+                    users,
+                    page_size=500,
+                    fetch=True
+                )
+                execute_values(
+                    cur,
+                    'INSERT INTO todo_categories (user_id, name, color) VALUES %s',
+                    [(row[0], cat_name, cat_color) for row in created for cat_name, cat_color in DEFAULT_CATEGORIES],
+                    page_size=500
+                )
+            conn.commit()
+            
+        except Exception as e:
+            conn.rollback()
+            raise click.ClickException(f'Bulk registration failed: {e}')
+    
+    click.echo(f'Registered {len(created)} users ({len(users) - len(created)} already existed)')
+
 @app.errorhandler(404)
 def not_found(e):
     return render_template('404.html'), 404
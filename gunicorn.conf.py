@@ -0,0 +1,9 @@
+# gunicorn.conf.py - Loaded automatically by `gunicorn app:app` (Procfile, render.yaml)
+import os
+
+# Threaded workers let one process keep serving while other requests wait on
+# Postgres or on password hashing (which runs in app.HASH_POOL, off the GIL).
+# Keep threads <= DB_POOL_MAX so every thread can borrow a pooled connection.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
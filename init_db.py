@@ -1,98 +1,260 @@
 # init_db.py - Initialize database on deployment
+import logging
+import time
 import psycopg2
+from psycopg2.extensions import make_dsn
+from psycopg2.pool import SimpleConnectionPool
 import os
-from urllib.parse import urlparse
 
-def init_database():
-    """Create tables automatically on deployment"""
+# Deploy logs: INFO by default, WARNING (errors only) when PRODUCTION=1
+logging.basicConfig(level=logging.WARNING if os.environ.get('PRODUCTION') == '1' else logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Preview/CI databases are disposable: EPHEMERAL_DB=1 creates the tables UNLOGGED
+# so seed and test inserts skip WAL (their data is lost on crash, which is fine there)
+UNLOGGED = 'UNLOGGED ' if os.environ.get('EPHEMERAL_DB') == '1' else ''
+
+# Each DDL block is one string: psycopg2 sends it as a single simple-query message,
+# so creating everything costs one round-trip instead of one per statement.
+# Encoded once here; psycopg2 passes bytes to libpq without re-encoding.
+SCHEMA_DDL = f'''
+    -- Columns are declared fixed-width first: Postgres lays rows out in declaration
+    -- order, so this avoids alignment padding after the variable-length values
+    CREATE {UNLOGGED}TABLE IF NOT EXISTS users (
+        id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        password VARCHAR(255) NOT NULL
+    );
     
-    db_url_str = os.environ.get('DATABASE_URL')
-    if not db_url_str:
-        print("No DATABASE_URL found, using local config")
-        DB_CONFIG = {
-            'dbname': 'todo_db',
-            'user': 'todo_user',
-            'password': 'thinkpad',
-            'host': 'localhost',
-            'port': '5432'
-        }
-    else:
-        # Fix Render's postgres:// to postgresql://
-        if db_url_str.startswith('postgres://'):
-            db_url_str = db_url_str.replace('postgres://', 'postgresql://', 1)
-        
-        db_url = urlparse(db_url_str)
-        DB_CONFIG = {
-            'dbname': db_url.path[1:],
-            'user': db_url.username,
-            'password': db_url.password,
-            'host': db_url.hostname,
-            'port': db_url.port or '5432'
-        }
+    CREATE {UNLOGGED}TABLE IF NOT EXISTS categories (
+        id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        color VARCHAR(7) DEFAULT '#667eea',
+        name VARCHAR(100) NOT NULL,
+        UNIQUE(user_id, name)
+    );
+    
+    -- Enum values are stored as 4-byte OIDs; CREATE TYPE has no IF NOT EXISTS
+    DO $$ BEGIN
+        CREATE TYPE todo_priority AS ENUM ('low', 'medium', 'high');
+    EXCEPTION WHEN duplicate_object THEN null;
+    END $$;
+    
+    DO $$ BEGIN
+        CREATE TYPE todo_status AS ENUM ('pending', 'in_progress', 'completed');
+    EXCEPTION WHEN duplicate_object THEN null;
+    END $$;
     
+    CREATE {UNLOGGED}TABLE IF NOT EXISTS todos (
+        id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        user_id BIGINT REFERENCES users(id) ON DELETE CASCADE,
+        category_id BIGINT REFERENCES categories(id) ON DELETE SET NULL,
+        -- Single mtime; creation order is recoverable from the id sequence
+        updated_at TIMESTAMPTZ DEFAULT now(),
+        -- 4-byte columns after the 8-byte ones so they need no padding
+        due_date DATE,
+        priority todo_priority DEFAULT 'medium',
+        status todo_status DEFAULT 'pending',
+        title VARCHAR(255) NOT NULL,
+        description TEXT
+    );
+'''.encode()
+
+# Built after any bulk data load, so loaders don't pay per-row index maintenance.
+# CONCURRENTLY only takes a ShareUpdateExclusiveLock, so app writes to a populated
+# todos table keep going; it can't run in a transaction block, hence one statement each.
+INDEXES = {
+    # One composite index serves user_id, user_id+status and user_id+status+priority
+    # lookups; the INCLUDE columns let list views answer from the index alone
+    'idx_todos_user_status_prio': b'''CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_todos_user_status_prio
+        ON todos(user_id, status, priority) INCLUDE (title, due_date)''',
+}
+
+# Superseded single-column indexes (priority alone was never selective anyway),
+# dropped only once every index in INDEXES is valid
+SUPERSEDED_INDEXES = ['idx_todos_user_id', 'idx_todos_status', 'idx_todos_priority']
+
+DROP_INDEX = {
+    name: b'DROP INDEX CONCURRENTLY IF EXISTS ' + name.encode()
+    for name in list(INDEXES) + SUPERSEDED_INDEXES
+}
+
+# Tables the schema block creates; it is skipped once all of them are visible
+SCHEMA_RELATIONS = ['users', 'categories', 'todos']
+
+# Resolved once at import; fix Render's postgres:// to postgresql://
+DATABASE_URL = os.environ.get('DATABASE_URL')
+if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
+    DATABASE_URL = 'postgresql://' + DATABASE_URL[len('postgres://'):]
+
+# libpq parses the URL itself, so it is passed through as the DSN unchanged
+if DATABASE_URL:
+    DB_DSN = DATABASE_URL
+else:
+    logger.debug("No DATABASE_URL found, using local config")
+    DB_DSN = make_dsn(
+        dbname='todo_db',
+        user='todo_user',
+        password='thinkpad',
+        host='localhost',
+        port='5432'
+    )
+
+CONNECT_ATTEMPTS = 6
+
+# Named in pg_stat_activity. Statement and lock timeouts are set per path below:
+# the concurrent index builds need far more than the schema transaction
+CONNECT_OPTIONS = {
+    'connect_timeout': 3,
+    'application_name': 'init_db',
+    'options': '-c idle_in_transaction_session_timeout=60000',
+}
+
+# A schema transaction stuck behind an app user's lock fails within seconds
+# instead of hanging the build; nothing in it should take long
+SCHEMA_SETTINGS = (
+    b"SET LOCAL synchronous_commit = off;"
+    b"SET LOCAL statement_timeout = '30s';"
+    b"SET LOCAL lock_timeout = '5s';"
+)
+
+# CONCURRENTLY scans todos twice and waits out every older transaction, so no
+# statement timeout there, only a generous cap on each lock wait
+INDEX_SETTINGS = b"SET statement_timeout = 0; SET lock_timeout = '5min'"
+
+def open_pool():
+    """Open the pool, retrying with exponential backoff while Postgres is still
+    coming up (cold deploys); re-raises after the last attempt"""
+    for attempt in range(CONNECT_ATTEMPTS):
+        try:
+            return SimpleConnectionPool(1, 4, DB_DSN, **CONNECT_OPTIONS)
+        except psycopg2.OperationalError as e:
+            if attempt == CONNECT_ATTEMPTS - 1:
+                raise
+            delay = 0.25 * 2 ** attempt
+            logger.warning("Database not reachable (%s), retrying in %.2fs", e, delay)
+            time.sleep(delay)
+
+# Opened once at import: minconn=1 performs the connect handshake during warm-up,
+# so repeated schema runs from the same process reuse an open connection
+POOL = open_pool()
+
+def relation_state(cur, names):
+    """Map each visible relation in names to whether it is usable: tables always are,
+    indexes only while valid (a failed CONCURRENTLY build leaves an INVALID one)"""
+    cur.execute(
+        """SELECT c.relname, coalesce(i.indisvalid, true)
+           FROM pg_class c
+           LEFT JOIN pg_index i ON i.indexrelid = c.oid
+           WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid)""",
+        (names,)
+    )
+    return dict(cur.fetchall())
+
+def run_ddl(ddl, description, relations):
+    """Execute a DDL block in one transaction unless its relations already exist;
+    returns True on success"""
     conn = None
     cur = None
     
     try:
-        print("Connecting to database...")
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = POOL.getconn()
         cur = conn.cursor()
         
-        print("Creating users table...")
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Warm starts: one catalog SELECT instead of re-running the whole block
+        state = relation_state(cur, relations)
+        if len(state) == len(relations) and all(state.values()):
+            conn.rollback()
+            logger.debug("%s already current, skipping", description)
+            return True
         
-        print("Creating categories table...")
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                name VARCHAR(100) NOT NULL,
-                color VARCHAR(7) DEFAULT '#667eea',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, name)
-            )
-        ''')
+        logger.debug("creating %s", description)
+        # The whole block is one transaction; don't wait for its WAL flush on commit
+        cur.execute(SCHEMA_SETTINGS + ddl)
         
-        print("Creating todos table...")
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS todos (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                category_id INTEGER REFERENCES categories(id) ON DELETE SET NULL,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                priority VARCHAR(10) DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high')),
-                status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'in_progress', 'completed')),
-                due_date DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        conn.commit()
+        logger.debug("%s created", description)
+        return True
+        
+    except Exception as e:
+        logger.error("Creating %s failed: %s", description, e)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            POOL.putconn(conn)
+
+def create_schema():
+    """Create the tables (no secondary indexes)"""
+    return run_ddl(SCHEMA_DDL, 'tables', SCHEMA_RELATIONS)
+
+def create_indexes():
+    """Create secondary indexes concurrently, then drop the ones they supersede; run
+    after any bulk data load. Returns True on success"""
+    conn = None
+    cur = None
+    
+    try:
+        conn = POOL.getconn()
+        cur = conn.cursor()
         
-        print("Creating indexes...")
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_user_id ON todos(user_id)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_status ON todos(status)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_todos_priority ON todos(priority)')
+        state = relation_state(cur, list(INDEXES) + SUPERSEDED_INDEXES)
+        current = all(state.get(name) for name in INDEXES)
+        if current and not any(name in state for name in SUPERSEDED_INDEXES):
+            conn.rollback()
+            logger.debug("indexes already current, skipping")
+            return True
         
-        conn.commit()
-        print("✅ Database initialized successfully!")
+        logger.debug("creating indexes")
+        conn.rollback()
+        conn.autocommit = True
+        cur.execute(INDEX_SETTINGS)
+        for name, statement in INDEXES.items():
+            # IF NOT EXISTS would keep an INVALID leftover from an interrupted build
+            if state.get(name) is False:
+                logger.warning("Rebuilding invalid index %s", name)
+                cur.execute(DROP_INDEX[name])
+            cur.execute(statement)
+        
+        # Never drop the working indexes unless their replacement is usable
+        state = relation_state(cur, list(INDEXES))
+        invalid = [name for name in INDEXES if not state.get(name)]
+        if invalid:
+            logger.error(
+                "Creating indexes failed: %s not valid, keeping superseded indexes",
+                ', '.join(invalid)
+            )
+            return False
+        for name in SUPERSEDED_INDEXES:
+            cur.execute(DROP_INDEX[name])
+        
+        logger.debug("indexes created")
+        return True
         
     except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
+        logger.error("Creating indexes failed: %s", e)
         if conn:
             conn.rollback()
+        return False
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            # Its session timeouts (and autocommit) were changed; don't reuse it
+            POOL.putconn(conn, close=True)
+
+def init_database():
+    """Create tables automatically on deployment"""
+    start = time.perf_counter()
+    if create_schema():
+        # Any COPY/seed loader belongs here, before the indexes exist
+        if create_indexes():
+            logger.info("schema init complete in %.2fs", time.perf_counter() - start)
 
 if __name__ == '__main__':
     init_database()
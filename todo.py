@@ -730,7 +730,7 @@ if __name__ == '__main__':
         print("✓ Database initialized successfully")
         print("🌐 Starting web server...")
         print("📱 Open your browser at: http://localhost:5000")
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        app.run(debug=False, host='0.0.0.0', port=5000)
     else:
         print("✗ Failed to initialize database")
         print("Please make sure PostgreSQL is running")
\ No newline at end of file